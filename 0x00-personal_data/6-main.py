@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Main file: get_db_pool/get_pooled_db against a fake connector
+"""
+import os
+import mysql.connector.pooling
+from mysql.connector.connection import MySQLConnection
+
+os.environ["PERSONAL_DATA_DB_POOL_SIZE"] = "3"
+get_db_pool = __import__('filtered_logger').get_db_pool
+get_pooled_db = __import__('filtered_logger').get_pooled_db
+
+opened = []
+
+
+class FakeConnection(MySQLConnection):
+    """Stand-in for a MySQL connection that never touches the network"""
+
+    def __init__(self, **kwargs):
+        self.connected = True
+        self.reconnects = 0
+        self.resets = 0
+        if kwargs:
+            opened.append(self)
+
+    def config(self, **kwargs):
+        pass
+
+    def is_connected(self):
+        return self.connected
+
+    def reconnect(self, attempts=1, delay=0):
+        self.reconnects += 1
+        self.connected = True
+
+    def reset_session(self, user_variables=None, session_variables=None):
+        self.resets += 1
+
+    def disconnect(self):
+        self.connected = False
+
+
+mysql.connector.pooling.connect = FakeConnection
+
+pool = get_db_pool()
+print("same pool: {}".format(get_db_pool() is pool))
+print("pool size: {}".format(pool.pool_size))
+print("connections opened: {}".format(len(opened)))
+
+for i in range(10):
+    db = get_pooled_db()
+    db.close()
+print("connections opened after 10 uses: {}".format(len(opened)))
+print("sessions reset on close: {}".format(
+    sum(cnx.resets for cnx in opened)))
+
+db = get_pooled_db()
+
+others = [get_pooled_db(), get_pooled_db()]
+try:
+    get_pooled_db()
+except mysql.connector.errors.PoolError:
+    print("exhausted after {} connections".format(1 + len(others)))
+for cnx in others + [db]:
+    cnx.close()
+
+for cnx in opened:
+    cnx.connected = False
+db = get_pooled_db()
+print("stale connection reconnected: {}".format(db._cnx.reconnects))
+db.close()
+print("connections opened: {}".format(len(opened)))
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Main file: fetch_rows/export_parallel against a fake cursor
+"""
+import logging
+
+filtered_logger = __import__('filtered_logger')
+ROW = ("bob", "bob@dylan.com", "555", "000-12", "pwd",
+       "1.2.3.4", "2019-11-14", "Mozilla")
+
+
+class BadValue:
+    """Value that fails to format inside a worker"""
+
+    def __str__(self):
+        raise ValueError("bad row")
+
+
+class FakeCursor:
+    """Cursor serving count copies of ROW, the first one bad if asked"""
+
+    def __init__(self, count, bad_first=False):
+        self.count = count
+        self.fetched = 0
+        self.bad_first = bad_first
+
+    def fetchmany(self, size):
+        rows = []
+        while len(rows) < size and self.fetched < self.count:
+            if self.bad_first and self.fetched == 0:
+                rows.append((BadValue(),) + ROW[1:])
+            else:
+                rows.append(ROW)
+            self.fetched += 1
+        return rows
+
+
+class ListHandler(logging.Handler):
+    """Keeps the formatted records"""
+
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+logger = logging.getLogger("export_check")
+logger.propagate = False
+handler = ListHandler()
+handler.setFormatter(
+    filtered_logger.RedactingFormatter(filtered_logger.PII_FIELDS))
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
+
+rows = list(filtered_logger.fetch_rows(FakeCursor(2500), 1000))
+print("fetch_rows: {}".format(len(rows)))
+
+filtered_logger.export_parallel(FakeCursor(2500), logger, 100, 2)
+message = handler.lines[0].split(": ", 1)[1]
+print("export_parallel: {}".format(len(handler.lines)))
+print(message)
+print("matches serial: {}".format(message == handler.format(
+    logging.LogRecord("export_check", logging.INFO, None, None,
+                      filtered_logger.format_row(
+                          filtered_logger.USER_FIELDS, ROW),
+                      None, None)).split(": ", 1)[1]))
+
+cursor = FakeCursor(200000, bad_first=True)
+try:
+    filtered_logger.export_parallel(cursor, logger, 100, 2)
+except ValueError as e:
+    print("failed with '{}', rows read: {}".format(
+        e, "all" if cursor.fetched == cursor.count else "some"))
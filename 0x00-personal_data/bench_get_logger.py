@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Check that the per-record cost of the user_data logger stays flat no
+matter how many times get_logger() has been called
+"""
+import io
+import sys
+import timeit
+from filtered_logger import get_logger, reconfigure_logger
+
+
+if __name__ == "__main__":
+    number = 5000
+    message = "name=Bob;email=bob@dylan.com;ssn=000-123-0000;ip=1.2.3.4;"
+    stderr, sys.stderr = sys.stderr, io.StringIO()
+    try:
+        logger = reconfigure_logger()
+        calls, timings = 1, []
+        for target in (1, 10, 100, 1000):
+            while calls < target:
+                get_logger()
+                calls += 1
+            seconds = timeit.timeit(lambda: logger.info(message),
+                                    number=number)
+            timings.append((calls, len(logger.handlers), seconds))
+            sys.stderr.seek(0)
+            sys.stderr.truncate()
+    finally:
+        sys.stderr = stderr
+    print("{:>6} {:>9} {:>12}".format("calls", "handlers", "record (us)"))
+    for calls, handlers, seconds in timings:
+        print("{:>6} {:>9} {:>12.2f}".format(
+            calls, handlers, seconds / number * 1e6))
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Compare the regex and tokenizing filter_datum backends
+"""
+import timeit
+from filtered_logger import (PII_FIELDS, RedactionEngine,
+                             TokenizingRedactionEngine)
+
+
+def make_message(width: int) -> str:
+    """Returns a `key=value;` message with width fields, PII ones first"""
+    keys = list(PII_FIELDS) + ["field_{}".format(i)
+                               for i in range(width - len(PII_FIELDS))]
+    return "".join("{}=value{};".format(key, i)
+                   for i, key in enumerate(keys[:width]))
+
+
+if __name__ == "__main__":
+    number = 2000
+    print("{:>6} {:>12} {:>12} {:>8}".format(
+        "fields", "regex (us)", "token (us)", "speedup"))
+    for width in (8, 25, 50, 100, 200):
+        message = make_message(width)
+        regex = RedactionEngine(PII_FIELDS, "***", ";")
+        token = TokenizingRedactionEngine(PII_FIELDS, "***", ";")
+        assert regex.redact(message) == token.redact(message)
+        t_regex = timeit.timeit(lambda: regex.redact(message), number=number)
+        t_token = timeit.timeit(lambda: token.redact(message), number=number)
+        print("{:>6} {:>12.2f} {:>12.2f} {:>7.2f}x".format(
+            width, t_regex / number * 1e6, t_token / number * 1e6,
+            t_regex / t_token))
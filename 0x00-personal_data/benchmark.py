@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the redaction and password hashing paths
+
+Prints one JSON object per case, in a fixed order with sorted keys, so
+two runs can be compared with diff.
+"""
+import argparse
+import json
+import logging
+import random
+import sys
+import timeit
+from typing import Dict, Iterator, List
+from filtered_logger import (PII_FIELDS, RedactingFormatter,
+                             RedactionEngine, TokenizingRedactionEngine,
+                             filter_datum)
+from encrypt_password import hash_password, is_valid
+
+
+def make_message(width: int, density: float, seed: int = 0) -> str:
+    """
+    Returns a `key=value;` message with width fields, a density fraction
+    of them named after PII_FIELDS, shuffled deterministically by seed
+    """
+    rng = random.Random(seed)
+    pii = round(width * density)
+    keys = [PII_FIELDS[i % len(PII_FIELDS)] for i in range(pii)] + \
+        ["field_{}".format(i) for i in range(width - pii)]
+    rng.shuffle(keys)
+    return "".join("{}={};".format(key, rng.getrandbits(32))
+                   for key in keys)
+
+
+def time_per_op(func, number: int) -> float:
+    """Returns the best of three runs of func, in microseconds per call"""
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def bench_redaction(widths: List[int], densities: List[float],
+                    number: int) -> Iterator[Dict]:
+    """Time filter_datum, both engines and RedactingFormatter.format"""
+    formatter = RedactingFormatter(PII_FIELDS)
+    engines = {
+        "regex": RedactionEngine(PII_FIELDS, "***", ";"),
+        "tokenize": TokenizingRedactionEngine(PII_FIELDS, "***", ";"),
+    }
+    for width in widths:
+        for density in densities:
+            message = make_message(width, density)
+            case = {"width": width, "density": density}
+            yield dict(case, bench="filter_datum", us_per_op=time_per_op(
+                lambda: filter_datum(PII_FIELDS, "***", message, ";"),
+                number))
+            for name, engine in engines.items():
+                yield dict(case, bench="engine." + name,
+                           us_per_op=time_per_op(
+                               lambda: engine.redact(message), number))
+            record = logging.LogRecord("user_data", logging.INFO, None,
+                                       None, message, None, None)
+
+            def format_record():
+                record.msg = message
+                return formatter.format(record)
+            yield dict(case, bench="RedactingFormatter.format",
+                       us_per_op=time_per_op(format_record, number))
+
+
+def bench_bcrypt(costs: List[int], number: int) -> Iterator[Dict]:
+    """Time hash_password and is_valid for each bcrypt cost"""
+    for rounds in costs:
+        hashed = hash_password("MyAmazingPassw0rd", rounds)
+        yield {"bench": "hash_password", "rounds": rounds,
+               "us_per_op": time_per_op(
+                   lambda: hash_password("MyAmazingPassw0rd", rounds),
+                   number)}
+        yield {"bench": "is_valid", "rounds": rounds,
+               "us_per_op": time_per_op(
+                   lambda: is_valid(hashed, "MyAmazingPassw0rd"), number)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--widths", type=int, nargs="+",
+                        default=[8, 25, 50, 100, 200])
+    parser.add_argument("--densities", type=float, nargs="+",
+                        default=[0.0, 0.25, 1.0])
+    parser.add_argument("--costs", type=int, nargs="+",
+                        default=[4, 8, 10, 12])
+    parser.add_argument("--number", type=int, default=1000,
+                        help="calls per timing of the redaction cases")
+    parser.add_argument("--skip-bcrypt", action="store_true")
+    args = parser.parse_args()
+
+    results = list(bench_redaction(args.widths, args.densities,
+                                   args.number))
+    if not args.skip_bcrypt:
+        results.extend(bench_bcrypt(args.costs, 1))
+    for result in results:
+        result["us_per_op"] = round(result["us_per_op"], 2)
+        json.dump(result, sys.stdout, sort_keys=True)
+        sys.stdout.write("\n")
@@ -3,14 +3,43 @@
 # Author: Oluwatobiloba Light
 """Hash a password"""
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List
 import bcrypt
 
 
-def hash_password(password: str) -> bytes:
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+
+def hash_password(password: str, rounds: int = None) -> bytes:
     """Returns a salted, hashed password, which is a byte string."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    if rounds is None:
+        rounds = BCRYPT_ROUNDS
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds))
+
+
+def hash_passwords(passwords: Iterable[str], workers: int = None,
+                   rounds: int = None) -> List[bytes]:
+    """
+    Returns the hashes of passwords in order, computed in a thread pool;
+    bcrypt releases the GIL while hashing so threads use several cores.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            lambda password: hash_password(password, rounds), passwords))
 
 
 def is_valid(hashed_password: bytes, password: str) -> bool:
     """Validate that the provided password matches the hashed password."""
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+
+
+def needs_rehash(hashed_password: bytes, rounds: int = None) -> bool:
+    """Returns True if hashed_password was not hashed with rounds."""
+    if rounds is None:
+        rounds = BCRYPT_ROUNDS
+    try:
+        return int(hashed_password.split(b'$')[2]) != rounds
+    except (IndexError, ValueError):
+        return True
@@ -3,19 +3,110 @@
 # Author: Oluwatobiloba Light
 """lOG MESSAGE"""
 
+import argparse
+import atexit
+import json
 import logging
-from typing import List
+import queue
+import threading
+import weakref
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import Iterator, List, Pattern, Sequence, Tuple
 import re
 import os
 import mysql.connector
+import mysql.connector.pooling
+
+
+@lru_cache(maxsize=128)
+def compile_fields_pattern(fields: Tuple[str, ...],
+                           separator: str) -> Pattern:
+    """Returns the compiled `field=value` pattern for fields and separator"""
+    pattern = r'({0})=([^{1}]+)(?={1}|$)'.\
+        format('|'.join(map(re.escape, fields)), re.escape(separator))
+    return re.compile(pattern)
+
+
+class RedactionEngine:
+    """Redacts `field=value` pairs with a precompiled pattern"""
+
+    def __init__(self, fields: Sequence[str], redaction: str,
+                 separator: str):
+        self.fields = tuple(fields)
+        self.redaction = redaction
+        self.separator = separator
+        self.pattern = compile_fields_pattern(self.fields, separator)
+        self.replacement = r'\1=' + redaction
+
+    def redact(self, message: str) -> str:
+        """Returns the message with the values of fields obfuscated"""
+        return self.pattern.sub(self.replacement, message)
+
+
+class TokenizingRedactionEngine(RedactionEngine):
+    """Redacts `field=value` pairs by splitting the message on separator
+
+    Each segment is checked against the field set with a hash lookup
+    instead of running the regex alternation over the whole message.
+    The output is the same as RedactionEngine's, falling back to the
+    regex when the separator, fields or redaction could make the two
+    disagree.
+    """
+
+    def __init__(self, fields: Sequence[str], redaction: str,
+                 separator: str):
+        super().__init__(fields, redaction, separator)
+        self.field_set = frozenset(self.fields)
+        self.lengths = sorted({len(field) for field in self.fields},
+                              reverse=True)
+        self.last_chars = None if '' in self.field_set else \
+            frozenset(field[-1] for field in self.fields)
+        self.tokenizable = len(separator) == 1 and separator != '=' and \
+            '\\' not in redaction and \
+            not any('=' in field or separator in field
+                    for field in self.fields)
+
+    def redact(self, message: str) -> str:
+        """Returns the message with the values of fields obfuscated"""
+        if not self.tokenizable:
+            return super().redact(message)
+        segments = message.split(self.separator)
+        for i, segment in enumerate(segments):
+            end = segment.find('=')
+            if end == -1:
+                continue
+            if segment[:end] in self.field_set:
+                if end + 1 < len(segment):
+                    segments[i] = segment[:end + 1] + self.redaction
+                continue
+            segments[i] = self._redact_segment(segment, end)
+        return self.separator.join(segments)
+
+    def _redact_segment(self, segment: str, end: int) -> str:
+        """Redacts a segment whose key is not itself a field
+
+        The regex also matches fields that are a suffix of the key or
+        appear inside the value, e.g. `name` in `username=bob`.
+        """
+        while end != -1 and end + 1 < len(segment):
+            if self.last_chars is not None and \
+                    segment[end - 1:end] not in self.last_chars:
+                end = segment.find('=', end + 1)
+                continue
+            for length in self.lengths:
+                if length <= end and segment[end - length:end] \
+                        in self.field_set:
+                    return segment[:end + 1] + self.redaction
+            end = segment.find('=', end + 1)
+        return segment
 
 
 def filter_datum(fields: List[str], redaction: str, message: str,
                  separator: str) -> str:
     """Returns the log message obfuscated"""
-    pattern = r'({0})=([^{1}]+)(?={1}|$)'.\
-        format('|'.join(map(re.escape, fields)), re.escape(separator))
-    return re.sub(pattern, r'\1=' + redaction, message)
+    return RedactionEngine(fields, redaction, separator).redact(message)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -24,75 +115,324 @@ class RedactingFormatter(logging.Formatter):
     REDACTION = "***"
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
+    # Set through extra= by export_parallel() only, on messages its
+    # workers have already redacted
+    PREREDACTED_ATTR = "_user_data_preredacted"
 
     def __init__(self, fields: List[str]):
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.engine = RedactionEngine(fields, self.REDACTION, self.SEPARATOR)
 
     def format(self, record: logging.LogRecord) -> str:
         """Filter values in incoming log records using filter_datum"""
-        record.msg = filter_datum(
-            self.fields, self.REDACTION, record.msg, self.SEPARATOR)
+        if not getattr(record, self.PREREDACTED_ATTR, False):
+            record.msg = self.engine.redact(record.msg)
         return super().format(record)
 
 
+class StructuredRedactingFormatter(logging.Formatter):
+    """
+    Formats records as JSON lines, redacting dict payloads by key
+
+    The payload is the `data` attribute set through `extra=` or a dict
+    passed as the record's args; other messages still go through the
+    `key=value` redaction. The record itself is left untouched; the
+    redacted line is cached per record in LINES, outside of it, so
+    other handlers sharing the same fields reuse it.
+    """
+
+    REDACTION = RedactingFormatter.REDACTION
+    # record -> {fields: redacted line}, dropped with the record
+    LINES = weakref.WeakKeyDictionary()
+
+    def __init__(self, fields: Sequence[str]):
+        super(StructuredRedactingFormatter, self).__init__()
+        self.fields = frozenset(fields)
+        self.engine = RedactionEngine(fields, self.REDACTION,
+                                      RedactingFormatter.SEPARATOR)
+
+    def redact(self, payload: dict) -> dict:
+        """Returns a copy of payload with the values of fields obfuscated"""
+        return {key: self.REDACTION if key in self.fields else value
+                for key, value in payload.items()}
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Returns the record as a redacted JSON line"""
+        cache = self.LINES.setdefault(record, {})
+        line = cache.get(self.fields)
+        if line is not None:
+            return line
+        payload = getattr(record, "data", None)
+        if isinstance(record.args, dict):
+            args = self.redact(record.args)
+            message = self.engine.redact(str(record.msg) % args)
+            if payload is None:
+                payload = args
+        else:
+            message = self.engine.redact(record.getMessage())
+        entry = {
+            "name": record.name,
+            "levelname": record.levelname,
+            "asctime": self.formatTime(record),
+            "message": message,
+        }
+        if isinstance(payload, dict):
+            entry["data"] = self.redact(payload)
+        line = json.dumps(entry, default=str)
+        cache[self.fields] = line
+        return line
+
+
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
+LOGGER_HANDLER_NAME = "user_data_redacting"
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler that hands records over unformatted and either blocks
+    or drops them when its bounded queue is full
+    """
+
+    def __init__(self, record_queue: queue.Queue, block: bool = True):
+        super().__init__(record_queue)
+        self.block = block
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Leave redaction and formatting to the listener's handlers"""
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put record on the queue according to the overflow policy"""
+        if self.block:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BlockingQueueListener(QueueListener):
+    """QueueListener whose stop() waits for room in a full queue"""
+
+    def enqueue_sentinel(self) -> None:
+        """Block until the sentinel fits so queued records get flushed"""
+        self.queue.put(self._sentinel)
 
 
-def get_logger() -> logging.Logger:
-    """Configure and return a logger named 'user_data'"""
+def get_logger(queue_size: int = 0, on_full: str = "block",
+               structured: bool = False) -> logging.Logger:
+    """Configure and return a logger named 'user_data'
+
+    The handler is only set up on the first call; later calls return the
+    same logger unchanged, use reconfigure_logger() to change it.
+    """
+    logger = logging.getLogger("user_data")
+    if any(handler.get_name() == LOGGER_HANDLER_NAME
+           for handler in logger.handlers):
+        return logger
+    return configure_logger(logger, queue_size, on_full, structured)
+
+
+def reconfigure_logger(queue_size: int = 0, on_full: str = "block",
+                       structured: bool = False) -> logging.Logger:
+    """Replace the handler of the 'user_data' logger and return it"""
     logger = logging.getLogger("user_data")
+    for handler in list(logger.handlers):
+        if handler.get_name() != LOGGER_HANDLER_NAME:
+            continue
+        logger.removeHandler(handler)
+        listener = getattr(handler, "listener", None)
+        if listener is not None:
+            atexit.unregister(listener.stop)
+            listener.stop()
+        handler.close()
+    return configure_logger(logger, queue_size, on_full, structured)
+
+
+def configure_logger(logger: logging.Logger, queue_size: int = 0,
+                     on_full: str = "block",
+                     structured: bool = False) -> logging.Logger:
+    """Attach a redacting handler to logger
+
+    With a queue_size, records go through a bounded queue to a background
+    listener that redacts and writes them; on_full is "block" or "drop".
+    With structured, dict payloads are redacted and written as JSON lines.
+    """
     logger.setLevel(logging.INFO)
     logger.propagate = False
 
     # Create StreamHandler with RedactingFormatter
     stream_handler = logging.StreamHandler()
-    formatter = RedactingFormatter(PII_FIELDS)
+    if structured:
+        formatter = StructuredRedactingFormatter(PII_FIELDS)
+    else:
+        formatter = RedactingFormatter(PII_FIELDS)
     stream_handler.setFormatter(formatter)
 
-    # Add StreamHandler to logger
-    logger.addHandler(stream_handler)
+    if queue_size <= 0:
+        # Add StreamHandler to logger
+        stream_handler.set_name(LOGGER_HANDLER_NAME)
+        logger.addHandler(stream_handler)
+        return logger
+
+    if on_full not in ("block", "drop"):
+        raise ValueError("on_full must be 'block' or 'drop'")
+    record_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = BoundedQueueHandler(record_queue,
+                                        block=on_full == "block")
+    queue_handler.set_name(LOGGER_HANDLER_NAME)
+    queue_handler.listener = BlockingQueueListener(record_queue,
+                                                   stream_handler)
+    queue_handler.listener.start()
+    atexit.register(queue_handler.listener.stop)
+    logger.addHandler(queue_handler)
 
     return logger
 
 
+def get_db_config() -> dict:
+    """Returns the connection settings from the PERSONAL_DATA_DB_* env"""
+    return {
+        "user": os.getenv("PERSONAL_DATA_DB_USERNAME", "root"),
+        "password": os.getenv("PERSONAL_DATA_DB_PASSWORD", ""),
+        "host": os.getenv("PERSONAL_DATA_DB_HOST", "localhost"),
+        "database": os.getenv("PERSONAL_DATA_DB_NAME", "holberton"),
+    }
+
+
 def get_db() -> mysql.connector.connection.MySQLConnection:
     """Connect to the MySQL database and return a connector"""
-    db_username = os.getenv("PERSONAL_DATA_DB_USERNAME", "root")
-    db_password = os.getenv("PERSONAL_DATA_DB_PASSWORD", "")
-    db_host = os.getenv("PERSONAL_DATA_DB_HOST", "localhost")
-    db_name = os.getenv("PERSONAL_DATA_DB_NAME", "holberton")
-
     # conntect to database
-    return mysql.connector.connection.MySQLConnection(
-        user=db_username,
-        password=db_password,
-        host=db_host,
-        database=db_name,
+    return mysql.connector.connection.MySQLConnection(**get_db_config())
+
+
+@lru_cache(maxsize=None)
+def get_db_pool() -> mysql.connector.pooling.MySQLConnectionPool:
+    """Create the connection pool once, sized by PERSONAL_DATA_DB_POOL_SIZE"""
+    return mysql.connector.pooling.MySQLConnectionPool(
+        pool_name="personal_data",
+        pool_size=int(os.getenv("PERSONAL_DATA_DB_POOL_SIZE", "5")),
+        pool_reset_session=True,
+        **get_db_config()
     )
 
 
-def main() -> None:
+def get_pooled_db() -> mysql.connector.pooling.PooledMySQLConnection:
+    """
+    Return a connection from the pool, reconnected by the pool if it went
+    stale; close() hands it back instead of disconnecting
+    """
+    return get_db_pool().get_connection()
+
+
+USER_FIELDS = ("name", "email", "phone", "ssn", "password",
+               "ip", "last_login", "user_agent")
+
+
+def fetch_batches(cursor, batch_size: int) -> Iterator[List[tuple]]:
+    """Yield the rows of an executed cursor in lists of batch_size rows"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def fetch_rows(cursor, batch_size: int) -> Iterator[tuple]:
+    """Yield the rows of an executed cursor, batch_size rows at a time"""
+    for rows in fetch_batches(cursor, batch_size):
+        yield from rows
+
+
+def format_row(fields: Sequence[str], row: tuple) -> str:
+    """Returns a `field=value; ...` log message for a single row"""
+    return "; ".join("{}={}".format(description, value)
+                     for description, value in zip(fields, row))
+
+
+def redact_rows(rows: List[tuple]) -> List[str]:
+    """Returns the redacted log messages of a batch of users rows"""
+    engine = RedactionEngine(PII_FIELDS, RedactingFormatter.REDACTION,
+                             RedactingFormatter.SEPARATOR)
+    return [engine.redact(format_row(USER_FIELDS, row)) for row in rows]
+
+
+def submit_batches(cursor, batch_size: int, executor: Executor,
+                   pending: queue.Queue, stop: threading.Event) -> None:
+    """
+    Queue one redaction future per batch read from cursor, in order,
+    until the cursor is exhausted or stop is set
+    """
+    try:
+        while not stop.is_set():
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            pending.put(executor.submit(redact_rows, rows))
+    except Exception as e:
+        failed = Future()
+        failed.set_exception(e)
+        pending.put(failed)
+    finally:
+        pending.put(None)
+
+
+def export_parallel(cursor, logger: logging.Logger, batch_size: int,
+                    workers: int) -> None:
+    """
+    Redact the rows of cursor across worker processes while a reader
+    thread keeps fetching, logging the messages in row order
+    """
+    pending = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        reader = threading.Thread(
+            target=submit_batches,
+            args=(cursor, batch_size, executor, pending, stop), daemon=True)
+        reader.start()
+        future = pending.get()
+        try:
+            while future is not None:
+                for message in future.result():
+                    logger.info(message, extra={
+                        RedactingFormatter.PREREDACTED_ATTR: True})
+                future = pending.get()
+        finally:
+            # Stop the reader, then unblock it so the pool can shut down
+            stop.set()
+            while future is not None:
+                future.cancel()
+                future = pending.get()
+            reader.join()
+
+
+def main(batch_size: int = 1000, workers: int = 0) -> None:
     """
     Retrieve all rows in the users table and display each row under a
     filtered format
     """
     db = get_db()
-    cursor = db.cursor()
+    cursor = db.cursor(buffered=False)
     cursor.execute("SELECT * FROM users")
-    rows = cursor.fetchall()
     logger = get_logger()
-    fields = ["name", "email", "phone", "ssn", "password",
-              "ip", "last_login", "user_agent"]
-    data = []
-    for row in rows:
-        for description, value in zip(fields, row):
-            info = "{}={}".format(description, value)
-            data.append(info)
-        logger.info("; ".join(data))
+    if workers > 1:
+        export_parallel(cursor, logger, batch_size, workers)
+    else:
+        for row in fetch_rows(cursor, batch_size):
+            logger.info(format_row(USER_FIELDS, row))
     cursor.close()
     db.close()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description="Log the users table with PII fields redacted")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="redact in N worker processes")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="rows fetched and redacted per batch")
+    args = parser.parse_args()
+    main(batch_size=args.batch_size, workers=args.workers)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# File: redact_csv.py
+# Author: Oluwatobiloba Light
+"""Redact PII columns of a CSV dump"""
+
+import argparse
+import csv
+import sys
+from itertools import islice
+from typing import Sequence, TextIO
+from filtered_logger import PII_FIELDS, RedactingFormatter
+
+
+def redact_csv(source: TextIO, destination: TextIO,
+               fields: Sequence[str] = PII_FIELDS,
+               redaction: str = RedactingFormatter.REDACTION,
+               chunk_size: int = 10000) -> int:
+    """
+    Copy the CSV in source to destination with the columns named in fields
+    obfuscated, chunk_size rows at a time. Returns the number of rows.
+    """
+    reader = csv.reader(source)
+    writer = csv.writer(destination)
+    header = next(reader, None)
+    if header is None:
+        return 0
+    writer.writerow(header)
+    columns = [i for i, name in enumerate(header) if name in fields]
+
+    count = 0
+    while True:
+        chunk = list(islice(reader, chunk_size))
+        if not chunk:
+            return count
+        for column in columns:
+            for row in chunk:
+                if column < len(row):
+                    row[column] = redaction
+        writer.writerows(chunk)
+        count += len(chunk)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Redact the PII columns of a CSV file")
+    parser.add_argument("source", help="CSV file to read, - for stdin")
+    parser.add_argument("destination", nargs="?", default="-",
+                        help="CSV file to write, - for stdout")
+    parser.add_argument("--chunk-size", type=int, default=10000,
+                        help="rows redacted and written per chunk")
+    args = parser.parse_args()
+
+    source = sys.stdin if args.source == "-" else \
+        open(args.source, newline="")
+    destination = sys.stdout if args.destination == "-" else \
+        open(args.destination, "w", newline="")
+    try:
+        redact_csv(source, destination, chunk_size=args.chunk_size)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if destination is not sys.stdout:
+            destination.close()
@@ -3,15 +3,22 @@
 Route module for the API
 """
 from os import getenv
+from api.v1.auth.auth import PathMatcher
 from api.v1.views import app_views
 from flask import Flask, abort, jsonify, request
 from flask_cors import (CORS)
+import models.base
 
 
 app = Flask(__name__)
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
+EXCLUDED_PATHS = PathMatcher([
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/'
+])
 
 if getenv('AUTH_TYPE') is not None:
     if getenv('AUTH_TYPE') == 'basic_auth':
@@ -27,19 +34,25 @@ def before_request():
     """
     Filters requests based on authorization requirements.
     """
-    if auth is None or not auth.\
-            require_auth(request.path,
-                         ['/api/v1/status/', '/api/v1/unauthorized/',
-                          '/api/v1/forbidden/']):
+    if auth is None or not auth.require_auth(request.path, EXCLUDED_PATHS):
         return
 
     if auth.authorization_header(request) is None:
         abort(401)
 
-    if auth.current_user(request) is None:
+    if auth.request_user(request) is None:
         abort(403)
 
 
+@app.teardown_appcontext
+def release_storage(exception=None) -> None:
+    """
+    Hands the request's storage connection back to its pool.
+    """
+    if models.base.STORAGE is not None:
+        models.base.STORAGE.release()
+
+
 @app.errorhandler(404)
 def not_found(error) -> str:
     """ Not found handler
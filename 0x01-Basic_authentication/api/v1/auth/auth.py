@@ -2,35 +2,83 @@
 """
 Auth module
 """
-from typing import List, TypeVar
-from flask import request
+from functools import lru_cache
+from typing import List, TypeVar, Union
+from flask import g, has_request_context, request
 
 
-class Auth:
-    """API Authenticaion"""
+class PathMatcher:
+    """Excluded paths compiled into a set and a prefix trie"""
 
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+    END = ''
+
+    def __init__(self, excluded_paths: List[str]):
         """
-        Determines if authentication is required for a given path.
+        Splits excluded_paths into exact paths and '*' prefixes.
         """
-        if path is None or excluded_paths is None or not excluded_paths:
-            return True
-
-        path = path.rstrip("/")
-
+        self.exact = set()
+        self.trie = {}
+        self.size = 0
         for excluded_path in excluded_paths:
             excluded_path = excluded_path.rstrip("/")
             if excluded_path.endswith("*"):
-                if path.startswith(excluded_path[:-1]):
-                    return False
+                node = self.trie
+                for char in excluded_path[:-1]:
+                    node = node.setdefault(char, {})
+                node[self.END] = True
             else:
-                if path == excluded_path:
-                    return False
+                self.exact.add(excluded_path)
+            self.size += 1
+
+    def __len__(self) -> int:
+        """
+        Returns the number of compiled paths.
+        """
+        return self.size
+
+    def matches(self, path: str) -> bool:
+        """
+        Tells if path, without its trailing slashes, is excluded.
+        """
+        path = path.rstrip("/")
+        if path in self.exact:
+            return True
+        node = self.trie
+        for char in path:
+            if self.END in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                return False
+        return self.END in node
+
+
+@lru_cache(maxsize=128)
+def compile_excluded_paths(excluded_paths: tuple) -> PathMatcher:
+    """
+    Returns the PathMatcher of excluded_paths, built once per tuple.
+    """
+    return PathMatcher(excluded_paths)
+
+
+class Auth:
+    """API Authenticaion"""
+
+    # Number of times request_user() had to run current_user()
+    resolve_count = 0
 
-        if path not in excluded_paths:
+    def require_auth(self, path: str,
+                     excluded_paths: Union[List[str], 'PathMatcher']) -> bool:
+        """
+        Determines if authentication is required for a given path.
+        """
+        if path is None or excluded_paths is None or not excluded_paths:
             return True
 
-        return False
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_excluded_paths(tuple(excluded_paths))
+
+        return not excluded_paths.matches(path)
 
     def authorization_header(self, request=None) -> str:
         """
@@ -46,3 +94,15 @@ class Auth:
         Retrieves the current user based on the request.
         """
         return None
+
+    def request_user(self, request=None) -> TypeVar('User'):
+        """
+        Returns current_user(request), resolved once per request and
+        kept on flask.g for the rest of it.
+        """
+        if not has_request_context():
+            return self.current_user(request)
+        if '_auth_user' not in g:
+            Auth.resolve_count += 1
+            g._auth_user = self.current_user(request)
+        return g._auth_user
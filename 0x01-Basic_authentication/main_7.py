@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+""" Main 7: before_request resolves the current user once per request
+
+Run with AUTH_TYPE set.
+"""
+import base64
+import uuid
+from os import getenv
+from api.v1.app import app
+from api.v1.auth.auth import Auth
+from models.user import User
+
+""" Create a user test """
+user_email = "bob{}@hbtn.io".format(uuid.uuid4().hex[:8])
+user_clear_pwd = "H0lberton:School:98!"
+
+user = User()
+user.email = user_email
+user.password = user_clear_pwd
+user.save()
+
+client = app.test_client()
+headers = {}
+if getenv('AUTH_TYPE') == 'basic_auth':
+    basic_clear = "{}:{}".format(user_email, user_clear_pwd)
+    headers['Authorization'] = "Basic {}".format(base64.b64encode(
+        basic_clear.encode('utf-8')).decode("utf-8"))
+
+for path in ['/api/v1/users/' + user.id, '/api/v1/users', '/api/v1/status']:
+    before = Auth.resolve_count
+    response = client.get(path, headers=headers)
+    print("{} {}: {} resolution(s)".format(
+        path, response.status_code, Auth.resolve_count - before))
+
+user.remove()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+""" SQLite storage module
+"""
+from datetime import datetime
+from os import getenv, path
+from typing import TypeVar, List
+import json
+import sqlite3
+import threading
+import models.base
+from models.base import TIMESTAMP_FORMAT, Journal, parse_conditions
+
+
+SYNCHRONOUS = {'always': 'FULL', 'batched': 'NORMAL', 'never': 'OFF'}
+SQL_OPERATORS = {'eq': '=', 'lt': '<', 'lte': '<=', 'gt': '>', 'gte': '>='}
+DB_SQLITE_TIMEOUT = float(getenv('DB_SQLITE_TIMEOUT', '30'))
+
+
+def sql_value(value):
+    """ Return value as it is stored in a row: datetimes use the
+    TIMESTAMP_FORMAT of to_json()
+    """
+    if type(value) is datetime:
+        return value.strftime(TIMESTAMP_FORMAT)
+    return value
+
+
+class SQLiteStorage():
+    """ Stores each model class in its own SQLite table
+
+    A row holds the object ID, its to_json(True) dict as JSON and one
+    indexed column per attribute in __indexes__ and __sorted_indexes__.
+    Other attributes are reached with json_extract().
+
+    Every statement runs against the file, so several API processes
+    can share it. Each thread borrows a connection from an idle pool and
+    hands it back with release(), at the end of each API request.
+
+    When a table is created, the objects of the .db_<Class>.json file
+    (and .db_<Class>.journal) of the file backends are imported into it,
+    so switching DB_STORAGE to sqlite keeps the existing data.
+    """
+
+    def __init__(self, db_path: str):
+        """ Initialize a storage in the SQLite file db_path
+        """
+        self.db_path = db_path
+        self.local = threading.local()
+        self.tables = set()
+        self.lock = threading.Lock()
+        self.idle = []
+
+    def connect(self) -> sqlite3.Connection:
+        """ Open a new connection in WAL mode
+        """
+        conn = sqlite3.connect(self.db_path, isolation_level=None,
+                               timeout=DB_SQLITE_TIMEOUT,
+                               check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous={}'.format(
+            SYNCHRONOUS.get(models.base.DB_FSYNC, 'FULL')))
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """ Return the connection of the current thread, taken from the
+        idle pool or opened
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            try:
+                conn = self.idle.pop()
+            except IndexError:
+                conn = self.connect()
+            self.local.conn = conn
+        return conn
+
+    def release(self):
+        """ Hand the connection of the current thread back to the idle
+        pool
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            self.local.conn = None
+            self.idle.append(conn)
+
+    def columns(self, cls: type) -> tuple:
+        """ Return the indexed attribute columns of cls
+        """
+        attrs = cls.__indexes__ + cls.__sorted_indexes__
+        return tuple(attr for attr in dict.fromkeys(attrs) if attr != 'id')
+
+    def table(self, cls: type) -> str:
+        """ Return the quoted table name of cls, creating the table
+        """
+        s_class = cls.__name__
+        table = '"{}"'.format(s_class)
+        if s_class in self.tables:
+            return table
+        with self.lock:
+            conn = self.connection()
+            columns = self.columns(cls)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                    "AND name = ?", [s_class]).fetchone()
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS {} (id TEXT PRIMARY KEY, '
+                    'data TEXT NOT NULL{})'.format(table, ''.join(
+                        ', "{}"'.format(column) for column in columns)))
+                for column in columns:
+                    conn.execute(
+                        'CREATE INDEX IF NOT EXISTS "{0}_{1}" '
+                        'ON {2} ("{1}")'.format(s_class, column, table))
+                if exists is None:
+                    self.import_json(cls, table)
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            self.tables.add(s_class)
+        return table
+
+    def import_json(self, cls: type, table: str):
+        """ Insert the objects saved by the file backends for cls
+        """
+        file_path = ".db_{}.json".format(cls.__name__)
+        objs_json = {}
+        if path.exists(file_path):
+            with open(file_path, 'r') as f:
+                objs_json = json.load(f)
+        Journal(cls).replay(objs_json)
+        conn = self.connection()
+        for obj_id, obj_json in objs_json.items():
+            conn.execute(self.insert_sql(cls, table),
+                         self.row(cls, obj_id, obj_json))
+
+    def insert_sql(self, cls: type, table: str) -> str:
+        """ Return the INSERT OR REPLACE statement of a row of cls
+        """
+        columns = self.columns(cls)
+        return 'INSERT OR REPLACE INTO {} (id, data{}) VALUES (?, ?{})'.format(
+            table, ''.join(', "{}"'.format(column) for column in columns),
+            ', ?' * len(columns))
+
+    def row(self, cls: type, obj_id: str, obj_json: dict) -> list:
+        """ Return the parameters of insert_sql() for obj_json
+        """
+        return [obj_id, json.dumps(obj_json)] + \
+            [obj_json.get(column) for column in self.columns(cls)]
+
+    def column(self, cls: type, attr: str) -> str:
+        """ Return the SQL expression reading attr
+        """
+        if not attr.isidentifier():
+            raise ValueError("Invalid attribute name: {}".format(attr))
+        if attr == 'id' or attr in self.columns(cls):
+            return '"{}"'.format(attr)
+        return "json_extract(data, '$.{}')".format(attr)
+
+    def where(self, cls: type, conditions: list) -> tuple:
+        """ Return the WHERE clause and parameters of conditions, a list
+        of (attribute, operator, value)
+        """
+        clauses, params = [], []
+        for attr, op, value in conditions:
+            column = self.column(cls, attr)
+            value = sql_value(value)
+            if op == 'startswith':
+                clauses.append('{0} >= ? AND {0} < ?'.format(column))
+                params.extend([value, value + '\U0010ffff'])
+            elif op == 'eq' and value is None:
+                clauses.append('{} IS NULL'.format(column))
+            else:
+                clauses.append('{} {} ?'.format(column, SQL_OPERATORS[op]))
+                params.append(value)
+        if len(clauses) == 0:
+            return '', params
+        return ' WHERE ' + ' AND '.join(clauses), params
+
+    def select(self, cls: type, sql: str,
+               params: list) -> List[TypeVar('Base')]:
+        """ Return the objects built from the data column of a SELECT
+        """
+        rows = self.connection().execute(sql, params)
+        return [cls(**json.loads(data)) for data, in rows]
+
+    def load(self, cls: type):
+        """ Create the table of cls if needed
+        """
+        self.table(cls)
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or replace the row of obj
+        """
+        cls = obj.__class__
+        self.connection().execute(
+            self.insert_sql(cls, self.table(cls)),
+            self.row(cls, obj.id, obj.to_json(True)))
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete the row of obj
+        """
+        self.connection().execute('DELETE FROM {} WHERE id = ?'.format(
+            self.table(obj.__class__)), [obj.id])
+
+    def count(self, cls: type) -> int:
+        """ Count the rows of cls
+        """
+        return self.connection().execute('SELECT COUNT(*) FROM {}'.format(
+            self.table(cls))).fetchone()[0]
+
+    def get(self, cls: type, id: str) -> TypeVar('Base'):
+        """ Return the object with this ID, or None
+        """
+        objs = self.select(cls, 'SELECT data FROM {} WHERE id = ?'.format(
+            self.table(cls)), [id])
+        return objs[0] if len(objs) > 0 else None
+
+    def search(self, cls: type,
+               attributes: dict) -> List[TypeVar('Base')]:
+        """ Return the objects equal to every value in attributes
+        """
+        return self.query(cls, attributes)
+
+    def query(self, cls: type, where: dict = None, order_by: str = None,
+              descending: bool = False, limit: int = None,
+              offset: int = 0) -> List[TypeVar('Base')]:
+        """ Run a Base.query() as a single SELECT
+        """
+        clause, params = self.where(cls, parse_conditions(where))
+        sql = 'SELECT data FROM {}{}'.format(self.table(cls), clause)
+        if order_by is not None:
+            sql += ' ORDER BY {}{}'.format(
+                self.column(cls, order_by), ' DESC' if descending else '')
+        if limit is not None or offset:
+            sql += ' LIMIT ? OFFSET ?'
+            params.extend([-1 if limit is None else limit, offset])
+        return self.select(cls, sql, params)
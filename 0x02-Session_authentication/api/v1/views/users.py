@@ -2,7 +2,7 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request
 from models.user import User
 
 
@@ -12,8 +12,8 @@ def view_all_users() -> str:
     Return:
       - list of all User objects JSON represented
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    return Response(User.encode_list(User.all()) + b'\n',
+                    mimetype='application/json')
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -32,12 +32,13 @@ def view_one_user(user_id: str = None) -> str:
         if getattr(request, 'current_user') is None:
             abort(404)
         else:
-            return jsonify(request.current_user.to_json())
+            return Response(request.current_user.encoded() + b'\n',
+                            mimetype='application/json')
 
     user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    return Response(user.encoded() + b'\n', mimetype='application/json')
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+""" Measure the memory held per User record in DATA
+"""
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+from models.user import User
+
+
+class DictUser():
+    """ Same attributes as User, stored in a regular __dict__
+    """
+
+    def __init__(self, **kwargs):
+        """ Initialize a DictUser instance
+        """
+        self.id = kwargs.get('id', str(uuid.uuid4()))
+        self.created_at = datetime.utcnow()
+        self.updated_at = datetime.utcnow()
+        self.email = kwargs.get('email')
+        self._password = kwargs.get('_password')
+        self.first_name = kwargs.get('first_name')
+        self.last_name = kwargs.get('last_name')
+
+
+def bytes_per_record(cls: type, count: int) -> float:
+    """ Return the bytes allocated per instance kept in an id -> obj dict
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = {}
+    for i in range(count):
+        obj = cls(email="bob{}@hbtn.io".format(i), _password="0" * 64)
+        objs[obj.id] = obj
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / count
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    for cls in (DictUser, User):
+        print("{:>8}: {:.1f} bytes/record over {} records".format(
+            cls.__name__, bytes_per_record(cls, count), count))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+""" Time Auth.require_auth with hundreds of excluded paths, as a plain
+list walked on every call and as a PathMatcher compiled once
+"""
+import random
+import sys
+import timeit
+from api.v1.auth.auth import Auth, PathMatcher
+
+
+def excluded_paths(count: int) -> list:
+    """ Return count public routes, a quarter of them '*' prefixes
+    """
+    paths = []
+    for i in range(count):
+        path = "/api/v1/public/service{}/resource{}".format(i % 37, i)
+        paths.append(path + "/*" if i % 4 == 0 else path + "/")
+    return paths
+
+
+def linear_require_auth(path: str, excluded_paths: list) -> bool:
+    """ The loop require_auth ran before PathMatcher
+    """
+    path = path.rstrip("/")
+    for excluded_path in excluded_paths:
+        excluded_path = excluded_path.rstrip("/")
+        if excluded_path.endswith("*"):
+            if path.startswith(excluded_path[:-1]):
+                return False
+        elif path == excluded_path:
+            return False
+    return True
+
+
+def requests(paths: list, count: int) -> list:
+    """ Return count request paths: excluded ones, paths under a '*'
+    prefix and protected ones
+    """
+    rng = random.Random(0)
+    picks = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            picks.append(rng.choice(paths).rstrip("*"))
+        elif kind == 1:
+            picks.append(rng.choice(paths).rstrip("/*") + "/deep/item")
+        else:
+            picks.append("/api/v1/users/{}".format(rng.random()))
+    return picks
+
+
+if __name__ == "__main__":
+    auth = Auth()
+    number = 20
+    print("{:>6} {:>14} {:>14}".format(
+        "rules", "list us/call", "trie us/call"))
+    for count in map(int, sys.argv[1:] or ["10", "100", "500", "1000"]):
+        paths = excluded_paths(count)
+        matcher = PathMatcher(paths)
+        picks = requests(paths, 1000)
+        for path in picks:
+            assert linear_require_auth(path, paths) == \
+                auth.require_auth(path, matcher)
+        timings = []
+        for call, rules in ((linear_require_auth, paths),
+                            (auth.require_auth, matcher)):
+            seconds = timeit.timeit(
+                lambda: [call(path, rules) for path in picks], number=number)
+            timings.append(seconds / (number * len(picks)) * 1e6)
+        print("{:>6} {:>14.2f} {:>14.2f}".format(count, *timings))
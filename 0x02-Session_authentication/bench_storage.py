@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+""" Measure save() throughput for each storage mode and fsync policy
+"""
+import os
+import sys
+import tempfile
+import time
+import models.base
+from models.base import flush_all
+from models.user import User
+
+
+def bench(storage: str, fsync: str, count: int, preload: int) -> float:
+    """ Return the saves per second of count users on top of preload
+    """
+    models.base.DB_STORAGE = storage
+    models.base.DB_FSYNC = fsync
+    models.base.JOURNALS.clear()
+    models.base.FLUSHERS.clear()
+    models.base.LAST_FSYNC.clear()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cwd = os.getcwd()
+        os.chdir(tmp_dir)
+        try:
+            User.load_from_file()
+            for i in range(preload):
+                user = User(email="preload{}@hbtn.io".format(i))
+                models.base.DATA['User'][user.id] = user
+            User.save_to_file()
+            start = time.perf_counter()
+            for i in range(count):
+                user = User()
+                user.email = "bob{}@hbtn.io".format(i)
+                user.password = "pwd"
+                user.save()
+            flush_all()
+            return count / (time.perf_counter() - start)
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    preload = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    print("{:>9} {:>8} {:>12}".format("storage", "fsync", "saves/s"))
+    for storage in ("file", "journal", "deferred"):
+        for fsync in ("always", "batched", "never"):
+            print("{:>9} {:>8} {:>12.1f}".format(
+                storage, fsync, bench(storage, fsync, count, preload)))
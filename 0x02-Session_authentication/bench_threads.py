@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+""" Stress the model store from several threads, then check consistency
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import models.base
+from models.base import DATA, INDEXES, SORTED_INDEXES, flush_all
+from models.user import User
+
+
+def worker(seed: int, seconds: float, counts: list, errors: list):
+    """ Save, remove, get and search users until seconds have passed
+    """
+    rng = random.Random(seed)
+    mine, ops, created = [], 0, 0
+    deadline = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < deadline:
+            action = rng.random()
+            if action < 0.2 or len(mine) == 0:
+                user = User()
+                user.email = "user{}-{}@hbtn.io".format(seed, created)
+                user.save()
+                mine.append(user)
+                created += 1
+            elif action < 0.25:
+                mine.pop(rng.randrange(len(mine))).remove()
+            elif action < 0.5:
+                user = rng.choice(mine)
+                if User.get(user.id) is not user:
+                    raise AssertionError("get lost {}".format(user.id))
+            elif action < 0.95:
+                user = rng.choice(mine)
+                if User.search({'email': user.email}) != [user]:
+                    raise AssertionError("search lost {}".format(user.id))
+            else:
+                User.query(order_by='created_at', limit=10)
+            ops += 1
+    except Exception as e:
+        errors.append(e)
+    counts.append((ops, len(mine)))
+
+
+def check_consistency():
+    """ Return the problems found between DATA, the indexes and the file
+    """
+    problems = []
+    objs = DATA['User']
+    for attr, index in INDEXES['User'].items():
+        if set(index.values) != set(objs):
+            problems.append("index {} out of sync".format(attr))
+    for attr, index in SORTED_INDEXES['User'].items():
+        if sorted(index.keys()) != index.keys() or \
+                set(index.values) != set(objs):
+            problems.append("sorted index {} out of sync".format(attr))
+    flush_all()
+    in_memory = {obj_id: obj.to_json(True) for obj_id, obj in objs.items()}
+    User.load_from_file()
+    on_disk = {obj.id: obj.to_json(True) for obj in User.all()}
+    if in_memory != on_disk:
+        problems.append("file differs from memory")
+    return problems
+
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        User.load_from_file()
+        counts, errors = [], []
+        workers = [threading.Thread(target=worker,
+                                    args=(i, seconds, counts, errors))
+                   for i in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        expected = sum(kept for ops, kept in counts)
+        problems = [str(e) for e in errors]
+        if User.count() != expected:
+            problems.append("count {} != {}".format(User.count(), expected))
+        problems.extend(check_consistency())
+    print("storage={} threads={} ops/s={:.0f} users={}".format(
+        models.base.DB_STORAGE, threads,
+        sum(ops for ops, kept in counts) / elapsed, expected))
+    print("consistent" if len(problems) == 0 else "\n".join(problems))
+    sys.exit(1 if problems else 0)
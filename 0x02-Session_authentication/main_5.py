@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+""" Main 5: before_request resolves the current user once per request
+
+Run with AUTH_TYPE (and SESSION_NAME for the session auths) set.
+"""
+import base64
+import uuid
+from os import getenv
+from api.v1.app import app
+from api.v1.auth.auth import Auth
+from models.user import User
+
+""" Create a user test """
+user_email = "bob{}@hbtn.io".format(uuid.uuid4().hex[:8])
+user_clear_pwd = "H0lberton:School:98!"
+
+user = User()
+user.email = user_email
+user.password = user_clear_pwd
+user.save()
+
+client = app.test_client()
+headers = {}
+if getenv('AUTH_TYPE') == 'basic_auth':
+    basic_clear = "{}:{}".format(user_email, user_clear_pwd)
+    headers['Authorization'] = "Basic {}".format(base64.b64encode(
+        basic_clear.encode('utf-8')).decode("utf-8"))
+else:
+    client.post('/api/v1/auth_session/login',
+                data={'email': user_email, 'password': user_clear_pwd})
+
+for path in ['/api/v1/users/me', '/api/v1/users', '/api/v1/status']:
+    before = Auth.resolve_count
+    response = client.get(path, headers=headers)
+    print("{} {}: {} resolution(s)".format(
+        path, response.status_code, Auth.resolve_count - before))
+
+user.remove()
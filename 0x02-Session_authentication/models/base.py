@@ -2,26 +2,525 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
+from itertools import islice
+from typing import TypeVar, List, Iterable, Iterator
+from os import getenv, path
+import atexit
+import bisect
 import json
+import logging
+import os
+import tempfile
+import threading
+import time
 import uuid
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+RAW_DATA = {}
+FIELDS = {}
+ENCODED = {}
+INDEXES = {}
+SORTED_INDEXES = {}
+QUERY_OPERATORS = {
+    'eq': lambda a, b: a == b,
+    'lt': lambda a, b: a is not None and a < b,
+    'lte': lambda a, b: a is not None and a <= b,
+    'gt': lambda a, b: a is not None and a > b,
+    'gte': lambda a, b: a is not None and a >= b,
+    'startswith': lambda a, b: isinstance(a, str) and a.startswith(b),
+}
+SORTED_INDEX_CHUNK = 512
+JOURNALS = {}
+FLUSHERS = {}
+WRITE_LOCKS = {}
+# Set to an object with the load, save, remove, count, get, search and
+# query methods of SQLiteStorage to replace DATA and the .db_*.json files
+STORAGE = None
+DB_STORAGE = getenv('DB_STORAGE', 'file')
+DB_LAZY_LOAD = getenv('DB_LAZY_LOAD', '0') == '1'
+DB_JOURNAL_RATIO = float(getenv('DB_JOURNAL_RATIO', '2'))
+DB_JOURNAL_MIN_SIZE = 64 * 1024
+DB_FLUSH_INTERVAL = float(getenv('DB_FLUSH_INTERVAL', '0.05'))
+DB_FLUSH_WRITES = int(getenv('DB_FLUSH_WRITES', '100'))
+DB_FSYNC = getenv('DB_FSYNC', 'always')
+DB_FSYNC_INTERVAL = float(getenv('DB_FSYNC_INTERVAL', '1'))
+LAST_FSYNC = {}
+FSYNC_TIMERS = {}
+FSYNC_LOCK = threading.Lock()
+# Read once at import: the umask can only be read by setting it
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def encode_json(obj) -> bytes:
+    """ Encode obj as compact JSON with sorted keys, like Flask's jsonify,
+    with orjson when it is installed
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def fsync_path(file_path: str):
+    """ fsync a file or a directory by path
+    """
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_path(file_path: str) -> bool:
+    """ fsync a file or a directory according to DB_FSYNC
+
+    'always' syncs every call and 'never' leaves it to the OS. 'batched'
+    syncs at most once every DB_FSYNC_INTERVAL seconds per path; a call
+    inside the interval schedules one trailing sync at its end instead,
+    so the last writes before an idle period are synced too.
+    Return True if the path was synced now.
+    """
+    if DB_FSYNC == 'never':
+        return False
+    file_path = path.abspath(file_path)
+    if DB_FSYNC == 'batched':
+        with FSYNC_LOCK:
+            now = time.monotonic()
+            wait = LAST_FSYNC.get(file_path, 0) + DB_FSYNC_INTERVAL - now
+            if wait > 0:
+                if file_path not in FSYNC_TIMERS:
+                    timer = threading.Timer(wait, trailing_sync, (file_path,))
+                    timer.daemon = True
+                    FSYNC_TIMERS[file_path] = timer
+                    timer.start()
+                return False
+            LAST_FSYNC[file_path] = now
+    fsync_path(file_path)
+    return True
+
+
+def trailing_sync(file_path: str):
+    """ Run the sync that sync_path() scheduled for file_path
+    """
+    with FSYNC_LOCK:
+        if FSYNC_TIMERS.pop(file_path, None) is None:
+            return
+        LAST_FSYNC[file_path] = time.monotonic()
+    try:
+        fsync_path(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def sync_pending():
+    """ Run every scheduled trailing sync now
+    """
+    for file_path, timer in list(FSYNC_TIMERS.items()):
+        timer.cancel()
+        trailing_sync(file_path)
+
+
+atexit.register(sync_pending)
+
+
+def sync_file(f, file_path: str) -> bool:
+    """ Flush an open file and sync it with sync_path()
+    """
+    f.flush()
+    return sync_path(file_path)
+
+
+class Index():
+    """ Equality index of one attribute: value -> ids of objects
+    """
+
+    def __init__(self, attr: str, entries: Iterable[tuple] = ()):
+        """ Initialize an index on attr from (object ID, value) pairs
+        """
+        self.attr = attr
+        self.ids = {}
+        self.values = {}
+        for obj_id, value in entries:
+            self.add_value(obj_id, value)
+
+    def add(self, obj: TypeVar('Base')):
+        """ Index obj under its current value, moving it if it changed
+        """
+        self.add_value(obj.id, getattr(obj, self.attr, None))
+
+    def add_value(self, obj_id: str, value):
+        """ Index an object ID under value, moving it if it changed
+        """
+        if obj_id in self.values:
+            if self.values[obj_id] == value:
+                return
+            self.discard(obj_id)
+        try:
+            self.ids.setdefault(value, {})[obj_id] = None
+        except TypeError:
+            return
+        self.values[obj_id] = value
+
+    def discard(self, obj_id: str):
+        """ Remove an object ID from the index
+        """
+        if obj_id not in self.values:
+            return
+        value = self.values.pop(obj_id)
+        ids = self.ids[value]
+        del ids[obj_id]
+        if len(ids) == 0:
+            del self.ids[value]
+
+    def lookup(self, value) -> Iterable[str]:
+        """ Return the IDs of objects indexed under value
+        """
+        return list(self.ids.get(value, {}))
+
+
+def parse_conditions(where: dict = None) -> list:
+    """ Return the (attribute, operator, value) conditions of a query
+    """
+    conditions = []
+    for key, value in (where or {}).items():
+        attr, _, op = key.partition('__')
+        op = op or 'eq'
+        if op not in QUERY_OPERATORS:
+            raise ValueError("Unknown query operator: {}".format(op))
+        conditions.append((attr, op, value))
+    return conditions
+
+
+def sort_key(value):
+    """ Return the key value is ordered by in a SortedIndex
+
+    Datetimes use their ISO format, which orders like the datetimes and
+    like the TIMESTAMP_FORMAT strings of objects still held as loaded
+    JSON.
+    """
+    if type(value) is datetime:
+        return value.isoformat()
+    return value
+
+
+class SortedIndex():
+    """ Ordered index of one attribute for range, prefix and ordered scans
+
+    Scans return a superset of the matching IDs (a strict bound is not
+    excluded), so results must still be checked. The sorted (key, ID)
+    entries are split in chunks of about SORTED_INDEX_CHUNK. Writers
+    replace the chunk they change and the list of chunks instead of
+    changing them, so a scan keeps a consistent copy and a write copies
+    O(sqrt N)-sized lists rather than the whole index.
+    """
+
+    def __init__(self, attr: str, entries: Iterable[tuple] = ()):
+        """ Initialize an index on attr from (object ID, value) pairs,
+        sorting them once
+        """
+        self.attr = attr
+        self.values = {}
+        self.none_ids = {}
+        for obj_id, value in entries:
+            self.values[obj_id] = sort_key(value)
+        keys = []
+        for obj_id, key in self.values.items():
+            if key is None:
+                self.none_ids[obj_id] = None
+            else:
+                keys.append((key, obj_id))
+        keys.sort()
+        chunks = [keys[i:i + SORTED_INDEX_CHUNK]
+                  for i in range(0, len(keys), SORTED_INDEX_CHUNK)]
+        # (chunks, last entry of each chunk), replaced as a whole
+        self.state = (chunks, [chunk[-1] for chunk in chunks])
+
+    def keys(self) -> list:
+        """ Return every (key, ID) entry in order
+        """
+        return [entry for chunk in self.state[0] for entry in chunk]
+
+    def add(self, obj: TypeVar('Base')):
+        """ Index obj under its current value, moving it if it changed
+        """
+        self.add_value(obj.id, getattr(obj, self.attr, None))
+
+    def add_value(self, obj_id: str, value):
+        """ Index an object ID under value, moving it if it changed
+        """
+        key = sort_key(value)
+        if obj_id in self.values:
+            if self.values[obj_id] == key:
+                return
+            self.discard(obj_id)
+        self.values[obj_id] = key
+        if key is None:
+            self.none_ids[obj_id] = None
+            return
+        entry = (key, obj_id)
+        chunks, maxes = self.state
+        if len(chunks) == 0:
+            self.state = ([[entry]], [entry])
+            return
+        i = min(bisect.bisect_left(maxes, entry), len(maxes) - 1)
+        chunk = chunks[i].copy()
+        bisect.insort(chunk, entry)
+        chunks, maxes = chunks.copy(), maxes.copy()
+        if len(chunk) > 2 * SORTED_INDEX_CHUNK:
+            half = len(chunk) // 2
+            chunks[i:i + 1] = [chunk[:half], chunk[half:]]
+            maxes[i:i + 1] = [chunk[half - 1], chunk[-1]]
+        else:
+            chunks[i] = chunk
+            maxes[i] = chunk[-1]
+        self.state = (chunks, maxes)
+
+    def discard(self, obj_id: str):
+        """ Remove an object ID from the index
+        """
+        if obj_id not in self.values:
+            return
+        key = self.values.pop(obj_id)
+        if key is None:
+            del self.none_ids[obj_id]
+            return
+        entry = (key, obj_id)
+        chunks, maxes = self.state
+        i = bisect.bisect_left(maxes, entry)
+        chunk = chunks[i].copy()
+        del chunk[bisect.bisect_left(chunk, entry)]
+        chunks, maxes = chunks.copy(), maxes.copy()
+        if len(chunk) == 0:
+            del chunks[i]
+            del maxes[i]
+        else:
+            chunks[i] = chunk
+            maxes[i] = chunk[-1]
+        self.state = (chunks, maxes)
+
+    def scan(self, op: str, value) -> Iterator[str]:
+        """ Yield in ascending order the IDs that may match op and value
+
+        None only equals the IDs held in none_ids and orders against
+        nothing, like NULL in SQL.
+        """
+        chunks, maxes = self.state
+        key = sort_key(value)
+        if key is None:
+            if op == 'eq':
+                yield from list(self.none_ids)
+            return
+        low = None if op in ('lt', 'lte') else key
+        i, j = 0, 0
+        if low is not None:
+            i = bisect.bisect_left(maxes, (low,))
+            if i < len(chunks):
+                j = bisect.bisect_left(chunks[i], (low,))
+        for chunk in islice(chunks, i, None):
+            for entry_key, obj_id in islice(chunk, j, None):
+                if op == 'startswith':
+                    if not entry_key.startswith(key):
+                        return
+                elif op != 'gt' and op != 'gte' and entry_key > key:
+                    return
+                yield obj_id
+            j = 0
+
+    def ordered(self, descending: bool = False) -> Iterator[str]:
+        """ Yield every indexed ID by value, None values first ascending
+        """
+        chunks, none_ids = self.state[0], list(self.none_ids)
+        if descending:
+            for chunk in reversed(chunks):
+                for entry_key, obj_id in reversed(chunk):
+                    yield obj_id
+            yield from none_ids
+        else:
+            yield from none_ids
+            for chunk in chunks:
+                for entry_key, obj_id in chunk:
+                    yield obj_id
+
+
+class Journal():
+    """ Append-only log of the saves and removes of one class
+
+    Each line is a JSON object: {"op": "save", "id": ..., "obj": {...}}
+    or {"op": "remove", "id": ...}. Once the log grows past
+    DB_JOURNAL_RATIO times the snapshot file, a background thread writes
+    a new snapshot and empties the log.
+    """
+
+    def __init__(self, cls: type):
+        """ Initialize the journal of cls
+        """
+        self.cls = cls
+        self.file_path = ".db_{}.journal".format(cls.__name__)
+        self.snapshot_path = ".db_{}.json".format(cls.__name__)
+        self.lock = threading.Lock()
+        self.compacting = False
+        self.size = 0
+        if path.exists(self.file_path):
+            self.size = path.getsize(self.file_path)
+        self.snapshot_size = 0
+        if path.exists(self.snapshot_path):
+            self.snapshot_size = path.getsize(self.snapshot_path)
+
+    def append(self, op: str, obj_id: str, obj_json: dict = None):
+        """ Append one operation and start a compaction if needed
+        """
+        entry = {'op': op, 'id': obj_id}
+        if obj_json is not None:
+            entry['obj'] = obj_json
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            with open(self.file_path, 'a') as f:
+                f.write(line)
+                sync_file(f, self.file_path)
+            self.size += len(line)
+            if self.compacting or self.size < DB_JOURNAL_MIN_SIZE or \
+                    self.size < self.snapshot_size * DB_JOURNAL_RATIO:
+                return
+            self.compacting = True
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def replay(self, objs: dict):
+        """ Apply the logged operations to objs, a dict of JSON objects
+
+        A partially written last line is cut off so that later appends
+        are not lost behind it.
+        """
+        if not path.exists(self.file_path):
+            return
+        with open(self.file_path, 'rb+') as f:
+            offset = 0
+            for line in iter(f.readline, b''):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    entry = None
+                if entry is None or not line.endswith(b'\n'):
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                if entry['op'] == 'save':
+                    objs[entry['id']] = entry['obj']
+                else:
+                    objs.pop(entry['id'], None)
+        self.size = offset
+
+    def compact(self):
+        """ Write a snapshot of the class and empty the log
+        """
+        with self.lock:
+            try:
+                self.cls.save_to_file()
+                open(self.file_path, 'w').close()
+                self.size = 0
+                self.snapshot_size = path.getsize(self.snapshot_path)
+            finally:
+                self.compacting = False
+
+
+class Flusher():
+    """ Write-behind saving of one class
+
+    Writes only mark the class dirty; a background thread saves the file
+    once DB_FLUSH_INTERVAL seconds have passed since the first pending
+    write, or sooner once DB_FLUSH_WRITES writes are pending.
+    """
+
+    def __init__(self, cls: type):
+        """ Initialize the flusher of cls
+        """
+        self.cls = cls
+        self.cond = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.pending = 0
+        self.thread = None
+
+    def mark_dirty(self):
+        """ Record one write, waking the flusher thread if enough are due
+        """
+        with self.cond:
+            self.pending += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def run(self):
+        """ Flush pending writes for as long as the process runs
+
+        A failed flush is logged and retried after DB_FLUSH_INTERVAL.
+        """
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending > 0)
+                self.cond.wait_for(
+                    lambda: self.pending >= DB_FLUSH_WRITES,
+                    timeout=DB_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    "Saving %s failed", self.cls.__name__)
+                time.sleep(DB_FLUSH_INTERVAL)
+
+    def flush(self):
+        """ Save the file now if any write is pending
+
+        If saving fails the writes stay pending.
+        """
+        with self.write_lock:
+            with self.cond:
+                if self.pending == 0:
+                    return
+                pending, self.pending = self.pending, 0
+            try:
+                self.cls.save_to_file()
+            except BaseException:
+                with self.cond:
+                    self.pending += pending
+                raise
+
+
+def flush_all():
+    """ Save every class with pending write-behind writes
+    """
+    for flusher in list(FLUSHERS.values()):
+        flusher.flush()
+
+
+atexit.register(flush_all)
 
 
 class Base():
     """ Base class
+
+    Attributes live in __slots__, so instances of subclasses that
+    declare theirs too carry no per-object __dict__.
     """
 
+    __slots__ = ('id', 'created_at', 'updated_at')
+    __indexes__ = ()
+    __sorted_indexes__ = ()
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
+        if INDEXES.get(s_class) is None:
+            self.__class__.reset_indexes()
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
@@ -48,65 +547,251 @@ class Base():
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
+        keys = self.__class__.fields() + tuple(getattr(self, '__dict__', ()))
+        for key in keys:
             if not for_serialization and key[0] == '_':
                 continue
+            value = getattr(self, key, None)
             if type(value) is datetime:
                 result[key] = value.strftime(TIMESTAMP_FORMAT)
             else:
                 result[key] = value
         return result
 
+    def encoded(self) -> bytes:
+        """ Return to_json() encoded as JSON, cached until the object is
+        saved or removed
+
+        Nothing is cached with a STORAGE: other processes may change the
+        object at any time and each get/search builds a fresh one anyway.
+        """
+        if STORAGE is not None:
+            return encode_json(self.to_json())
+        s_class = self.__class__.__name__
+        cache = ENCODED.setdefault(s_class, {})
+        data = cache.get(self.id)
+        if data is None:
+            data = encode_json(self.to_json())
+            cache[self.id] = data
+        return data
+
+    @classmethod
+    def encode_list(cls, objs: Iterable[TypeVar('Base')]) -> bytes:
+        """ Return a JSON array of objs built from their cached encodings
+        """
+        return b'[' + b','.join(obj.encoded() for obj in objs) + b']'
+
+    @classmethod
+    def fields(cls) -> tuple:
+        """ Return the slot names of the class, base class first
+        """
+        s_class = cls.__name__
+        if FIELDS.get(s_class) is None:
+            FIELDS[s_class] = tuple(
+                slot for klass in reversed(cls.__mro__)
+                for slot in klass.__dict__.get('__slots__', ()))
+        return FIELDS[s_class]
+
+    @classmethod
+    def reset_indexes(cls):
+        """ Rebuild the indexes declared in __indexes__ and
+        __sorted_indexes__ from DATA
+        """
+        s_class = cls.__name__
+
+        def entries(attr):
+            for obj_id, obj_json in RAW_DATA.get(s_class, {}).items():
+                yield obj_id, obj_json.get(attr)
+            for obj in DATA.get(s_class, {}).values():
+                yield obj.id, getattr(obj, attr, None)
+
+        with cls.write_lock():
+            indexes = {attr: Index(attr, entries(attr))
+                       for attr in cls.__indexes__}
+            sorted_indexes = {attr: SortedIndex(attr, entries(attr))
+                              for attr in cls.__sorted_indexes__}
+            INDEXES[s_class] = indexes
+            SORTED_INDEXES[s_class] = sorted_indexes
+
+    @classmethod
+    def indexes(cls) -> list:
+        """ Return the equality and sorted indexes of the class
+        """
+        s_class = cls.__name__
+        return list(INDEXES.get(s_class, {}).values()) + \
+            list(SORTED_INDEXES.get(s_class, {}).values())
+
+    @classmethod
+    def materialize(cls, obj_id: str) -> TypeVar('Base'):
+        """ Return the object with this ID, building it from its loaded
+        JSON on first access when DB_LAZY_LOAD is on
+        """
+        s_class = cls.__name__
+        if obj_id in RAW_DATA.get(s_class, {}):
+            with cls.write_lock():
+                obj_json = RAW_DATA[s_class].get(obj_id)
+                if obj_json is not None:
+                    DATA[s_class][obj_id] = cls(**obj_json)
+                    del RAW_DATA[s_class][obj_id]
+        return DATA[s_class].get(obj_id)
+
+    @classmethod
+    def materialize_all(cls):
+        """ Build every object still held as loaded JSON
+        """
+        s_class = cls.__name__
+        for obj_id in list(RAW_DATA.get(s_class, {})):
+            cls.materialize(obj_id)
+
+    @classmethod
+    def write_lock(cls) -> threading.RLock:
+        """ Return the lock serializing the writers of the class
+
+        Readers take no lock: they work on snapshots (list() copies of
+        DATA, copy-on-write sorted indexes) that writers never change.
+        """
+        s_class = cls.__name__
+        lock = WRITE_LOCKS.get(s_class)
+        if lock is None:
+            lock = WRITE_LOCKS.setdefault(s_class, threading.RLock())
+        return lock
+
+    @classmethod
+    def journal(cls) -> Journal:
+        """ Return the journal of the class, used when DB_STORAGE=journal
+        """
+        s_class = cls.__name__
+        if JOURNALS.get(s_class) is None:
+            JOURNALS[s_class] = Journal(cls)
+        return JOURNALS[s_class]
+
+    @classmethod
+    def flusher(cls) -> Flusher:
+        """ Return the flusher of the class, used when DB_STORAGE=deferred
+        """
+        s_class = cls.__name__
+        if FLUSHERS.get(s_class) is None:
+            FLUSHERS[s_class] = Flusher(cls)
+        return FLUSHERS[s_class]
+
     @classmethod
     def load_from_file(cls):
         """ Load all objects from file
+
+        With DB_LAZY_LOAD, objects are kept as their JSON dicts and only
+        built, timestamps included, on their first get/search hit.
         """
+        if STORAGE is not None:
+            STORAGE.load(cls)
+            return
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
-
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        with cls.write_lock():
+            objs_json = {}
+            if path.exists(file_path):
+                with open(file_path, 'r') as f:
+                    objs_json = json.load(f)
+            if DB_STORAGE == 'journal':
+                cls.journal().replay(objs_json)
+            objs = {}
+            if not DB_LAZY_LOAD:
+                for obj_id, obj_json in objs_json.items():
+                    objs[obj_id] = cls(**obj_json)
+                objs_json = {}
+            DATA[s_class] = objs
+            RAW_DATA[s_class] = objs_json
+            ENCODED[s_class] = {}
+            cls.reset_indexes()
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
+
+        The file is written to a temporary file, synced unless DB_FSYNC is
+        'never', and renamed over the old one, so a crash never leaves it
+        truncated. Only the sync of the directory is batched.
+        The new file keeps the mode of the old one, or gets the default
+        one allowed by the umask.
         """
+        if STORAGE is not None:
+            return
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
+        objs_json = dict(RAW_DATA.get(s_class, {}))
+        for obj_id, obj in list(DATA[s_class].items()):
             objs_json[obj_id] = obj.to_json(True)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        try:
+            mode = os.stat(file_path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o666 & ~UMASK
+        fd, tmp_path = tempfile.mkstemp(prefix=file_path, dir='.')
+        try:
+            os.fchmod(fd, mode)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(objs_json, f)
+                if DB_FSYNC != 'never':
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        sync_path('.')
+
+    @classmethod
+    def persist(cls, op: str, obj: TypeVar('Base')):
+        """ Write a 'save' or 'remove' of obj according to DB_STORAGE
+        """
+        if DB_STORAGE == 'journal':
+            obj_json = obj.to_json(True) if op == 'save' else None
+            cls.journal().append(op, obj.id, obj_json)
+        elif DB_STORAGE == 'deferred':
+            cls.flusher().mark_dirty()
+        else:
+            cls.save_to_file()
 
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        ENCODED.get(s_class, {}).pop(self.id, None)
+        if STORAGE is not None:
+            STORAGE.save(self)
+            return
+        with self.__class__.write_lock():
+            DATA[s_class][self.id] = self
+            RAW_DATA.get(s_class, {}).pop(self.id, None)
+            for index in self.__class__.indexes():
+                index.add(self)
+            self.__class__.persist('save', self)
 
     def remove(self):
         """ Remove object
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
+        if STORAGE is not None:
+            ENCODED.get(s_class, {}).pop(self.id, None)
+            STORAGE.remove(self)
+            return
+        with self.__class__.write_lock():
+            if DATA[s_class].get(self.id) is None:
+                return
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            ENCODED.get(s_class, {}).pop(self.id, None)
+            for index in self.__class__.indexes():
+                index.discard(self.id)
+            self.__class__.persist('remove', self)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
+        if STORAGE is not None:
+            return STORAGE.count(cls)
         s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return len(DATA[s_class].keys()) + len(RAW_DATA.get(s_class, {}))
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -118,14 +803,28 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
+        if STORAGE is not None:
+            return STORAGE.get(cls, id)
         s_class = cls.__name__
-        return DATA[s_class].get(id)
+        obj = DATA[s_class].get(id)
+        if obj is None and id in RAW_DATA.get(s_class, {}):
+            obj = cls.materialize(id)
+        return obj
 
     @classmethod
-    def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
+    def search(cls, attributes: dict = None) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+
+        Equality on an attribute listed in __indexes__ only looks at the
+        objects indexed under that value instead of the whole class.
+        Indexes follow saves, so an object whose indexed attribute was
+        changed but not saved yet matches neither value until saved.
         """
         s_class = cls.__name__
+        if attributes is None:
+            attributes = {}
+        if STORAGE is not None:
+            return STORAGE.search(cls, attributes)
 
         def _search(obj):
             if len(attributes) == 0:
@@ -135,4 +834,77 @@ class Base():
                     return False
             return True
 
-        return list(filter(_search, DATA[s_class].values()))
+        objs = DATA[s_class]
+        indexes = INDEXES.get(s_class, {})
+        for k, v in attributes.items():
+            if k not in indexes:
+                continue
+            try:
+                ids = indexes[k].lookup(v)
+            except TypeError:
+                continue
+            found = filter(None, map(cls.materialize, ids))
+            return list(filter(_search, found))
+        cls.materialize_all()
+        return list(filter(_search, list(objs.values())))
+
+    @classmethod
+    def query(cls, where: dict = None, order_by: str = None,
+              descending: bool = False, limit: int = None,
+              offset: int = 0) -> List[TypeVar('Base')]:
+        """ Search objects matching every condition in where
+
+        Keys are an attribute name, optionally followed by `__` and one
+        of the QUERY_OPERATORS: `{'created_at__gte': date,
+        'email__startswith': 'bob'}`. Candidates come from an equality
+        index, else from a sorted index on a condition or on order_by,
+        else from every object. Results are ordered by order_by (None
+        first when ascending) and sliced by offset and limit.
+        """
+        if STORAGE is not None:
+            return STORAGE.query(cls, where, order_by, descending, limit,
+                                 offset)
+        s_class = cls.__name__
+        conditions = parse_conditions(where)
+
+        indexes = INDEXES.get(s_class, {})
+        sorted_indexes = SORTED_INDEXES.get(s_class, {})
+        ids, ordered = None, False
+        for attr, op, value in conditions:
+            if op == 'eq' and attr in indexes:
+                try:
+                    ids = list(indexes[attr].lookup(value))
+                    break
+                except TypeError:
+                    continue
+        if ids is None:
+            for attr, op, value in conditions:
+                if attr in sorted_indexes:
+                    ids = sorted_indexes[attr].scan(op, value)
+                    ordered = order_by == attr and not descending
+                    break
+        if ids is None and order_by in sorted_indexes:
+            ids = sorted_indexes[order_by].ordered(descending)
+            ordered = True
+        if ids is None:
+            cls.materialize_all()
+            ids = list(DATA[s_class])
+
+        def _match(obj):
+            for attr, op, value in conditions:
+                if not QUERY_OPERATORS[op](getattr(obj, attr, None), value):
+                    return False
+            return True
+
+        objs = filter(_match, filter(None, map(cls.materialize, ids)))
+        if order_by is not None and not ordered:
+            objs = sorted(objs, reverse=descending, key=lambda obj: (
+                getattr(obj, order_by, None) is not None,
+                sort_key(getattr(obj, order_by, None))))
+        stop = None if limit is None else offset + limit
+        return list(islice(objs, offset, stop))
+
+
+if DB_STORAGE == 'sqlite':
+    from models.sqlite_storage import SQLiteStorage
+    STORAGE = SQLiteStorage(getenv('DB_SQLITE_PATH', '.db.sqlite3'))
@@ -2,6 +2,7 @@
 """ User module
 """
 import hashlib
+import hmac
 from models.base import Base
 
 
@@ -9,6 +10,10 @@ class User(Base):
     """ User class
     """
 
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+    __indexes__ = ('email',)
+    __sorted_indexes__ = ('email', 'created_at', 'updated_at')
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
         """
@@ -38,10 +43,10 @@ class User(Base):
         """
         if pwd is None or type(pwd) is not str:
             return False
-        if self.password is None:
+        if type(self._password) is not str:
             return False
-        pwd_e = pwd.encode()
-        return hashlib.sha256(pwd_e).hexdigest().lower() == self.password
+        pwd_hash = hashlib.sha256(pwd.encode()).hexdigest()
+        return hmac.compare_digest(pwd_hash.encode(), self._password.encode())
 
     def display_name(self) -> str:
         """ Display User name based on email/first_name/last_name
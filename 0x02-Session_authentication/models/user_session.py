@@ -10,6 +10,10 @@ class UserSession(Base):
     User session class.
     """
 
+    __slots__ = ('user_id', 'session_id')
+    __indexes__ = ('session_id',)
+    __sorted_indexes__ = ('created_at',)
+
     def __init__(self, *args: list, **kwargs: dict):
         """
         Initializes a User session instance.